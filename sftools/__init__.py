@@ -2,15 +2,15 @@
 #
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
-from .sf import SF
 
-# We must import these here so their __init_subclass__() methods are called
-from .case import *        # noqa
-from .casecomment import * # noqa
-from .user import *        # noqa
-
-# Custom modules, for non-standard type/object deployments
-from .custom import *      # noqa
+__all__ = ['SF']
 
 
-__all__ = ['SF']
+def __getattr__(name):
+    # Import SF only when it's actually used; it pulls in simple_salesforce,
+    # which is slow to import and not needed for e.g. 'sf-case --help'
+    if name == 'SF':
+        from .sf import SF
+        globals()['SF'] = SF
+        return SF
+    raise AttributeError(f'module {__name__} has no attribute {name}')
@@ -6,11 +6,16 @@ from copy import copy
 from functools import partial
 from types import SimpleNamespace
 
-from sftools.sf import SF
 from sftools.config import SFConfig
 
 
 class SFArgumentParser(argparse.ArgumentParser):
+    # Actions performed by sf(), once it creates the SF instance
+    SF_ACTIONS = {
+        'show_config': lambda sf: sf.config.show(),
+        'show_full_config': lambda sf: sf.config.show(full=True),
+    }
+
     def __init__(self, *args, action_required=False, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -18,6 +23,8 @@ class SFArgumentParser(argparse.ArgumentParser):
                           help='Dry-run only, do not make any changes')
         self.add_argument('-v', '--verbose', action='store_true',
                           help='Be verbose.')
+        self.add_argument('--no-cache', action='store_true',
+                          help='Do not use cached Salesforce metadata')
 
         config = self.add_mutually_exclusive_group()
         config.add_argument('--config',
@@ -50,7 +57,11 @@ class SFArgumentParser(argparse.ArgumentParser):
         return opts
 
     def sf(self, opts, *args, **kwargs):
+        # Only import SF (and simple_salesforce) once we actually need it
+        from sftools.sf import SF
+
         kwargs.setdefault('verbose', opts.verbose)
+        kwargs.setdefault('cache', not opts.no_cache)
 
         config = None
         if opts.config:
@@ -62,10 +73,10 @@ class SFArgumentParser(argparse.ArgumentParser):
 
         sf = SF(config, *args, **kwargs)
 
-        if opts.show_config:
-            sf.config.show()
-        elif opts.show_full_config:
-            sf.config.show(full=True)
+        for name, action in self.SF_ACTIONS.items():
+            if getattr(opts, name):
+                action(sf)
+                break
 
         return sf
 
@@ -125,14 +136,38 @@ class SFObjectArgumentParser(SFArgumentParser):
             return objects[:opts.limit]
         return objects
 
+    def prefetch(self, objects, fields):
+        '''Get any of the fields missing from the objects, for all objects at once.
+
+        Objects may not have all the fields, e.g. if they were looked up by Id, and
+        otherwise each object would separately query each of its missing fields.
+        '''
+        sftypes = {o._sftype for o in objects if o is not None}
+        for sftype in sftypes:
+            typefields = [f for f in fields if f in sftype._fieldnameset]
+            if typefields:
+                sftype.prefetch([o for o in objects if o is not None and o._sftype is sftype],
+                                *typefields)
+
     def delete(self, opts, objects):
-        objects = self.limit_objects(opts, objects)
+        objects = [o for o in self.limit_objects(opts, objects) if o is not None]
+        if not objects:
+            return
         for o in objects:
             print(f'DELETING object Id {o.Id}')
-            time.sleep(1)
-            o.delete()
+        # Give the user a moment to interrupt
+        time.sleep(1)
+        # Delete each type's objects together, in the order of the objects
+        for sftype in dict.fromkeys(o._sftype for o in objects):
+            results = sftype.delete_many(*[o.Id for o in objects if o._sftype is sftype])
+            for result in results:
+                if not result.get('success'):
+                    print(f"Failed to delete object Id {result.get('id')}: "
+                          f"{result.get('errors')}")
 
     def dumpfields(self, opts, objects):
         objects = self.limit_objects(opts, objects)
+        if opts.field:
+            self.prefetch(objects, opts.field)
         for o in objects:
             o.dumpfields(fields=opts.field, label=opts.label)
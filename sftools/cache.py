@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+#
+# Copyright 2022 Dan Streetman <ddstreet@ieee.org>
+
+import json
+import os
+import time
+
+
+class SFCache(object):
+    '''On-disk cache of Salesforce metadata.
+
+    Each cache entry is stored as a json file in our path, and is only used
+    until it is older than our ttl (in seconds).
+
+    This is only intended for metadata that rarely changes, like describe()
+    results; any failure to read or write the cache is treated as a cache miss.
+    '''
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, path, ttl=DEFAULT_TTL, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def _file(self, name):
+        return self.path / f'{name}.json'
+
+    def get(self, name):
+        '''Get the cached value for name, or None if not cached (or expired).'''
+        if not self.enabled:
+            return None
+        cachefile = self._file(name)
+        try:
+            if cachefile.stat().st_mtime < time.time() - self.ttl:
+                return None
+            return json.loads(cachefile.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def set(self, name, value):
+        '''Cache the value for name.'''
+        if not self.enabled:
+            return
+        cachefile = self._file(name)
+        tmpfile = cachefile.with_name(f'.{cachefile.name}.{os.getpid()}')
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmpfile.write_text(json.dumps(value))
+            tmpfile.replace(cachefile)
+        except OSError:
+            tmpfile.unlink(missing_ok=True)
+
+    def cached(self, name, func):
+        '''Get the cached value for name, or call func to get (and cache) the value.'''
+        value = self.get(name)
+        if value is None:
+            value = func()
+            self.set(name, value)
+        return value
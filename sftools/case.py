@@ -3,7 +3,6 @@
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
 from functools import cached_property
-from functools import lru_cache
 
 from sftools.object import SFObject
 from sftools.soql import WhereUtil
@@ -12,6 +11,7 @@ from sftools.type import SFType
 
 class SFCaseType(SFType, name='Case'):
     '''SF Case Type.'''
+
     def __call__(self, id_or_number):
         '''Allow looking up cases by Case.Id or Case.CaseNumber'''
         return super().__call__(self._casenumber_to_record(id_or_number))
@@ -21,17 +21,57 @@ class SFCaseType(SFType, name='Case'):
 
         On failure, 'number' is returned.
         '''
-        try:
-            n = int(number)
-        except (ValueError, TypeError):
+        if isinstance(number, str) and self.ID_REGEX.fullmatch(number):
+            # Already a Case.Id
             return number
 
-        if len(str(n)) <= 8:
-            where = f"CaseNumber = '{str(n).zfill(8)}'"
+        casenumber = self._casenumber(number)
+        if casenumber:
+            where = f"CaseNumber = '{casenumber}'"
             return self.query(where=where, only_open=False).record
 
         return number
 
+    @staticmethod
+    def _casenumber(number):
+        '''Get the zero-padded CaseNumber string for number, or None if it isn't one.'''
+        try:
+            n = int(number)
+        except (ValueError, TypeError):
+            return None
+
+        # CaseNumbers are (at most) 8 digits
+        if 0 <= n < 100_000_000:
+            return f'{n:08d}'
+        return None
+
+    def lookup(self, *numbers):
+        '''Lookup multiple Cases by CaseNumber.
+
+        This performs a single query (per batch of CaseNumbers) instead of
+        one query per CaseNumber.
+
+        Returns a dict of the found Cases, keyed by each provided number.
+        '''
+        casenumbers = {}
+        for number in numbers:
+            casenumber = self._casenumber(number)
+            if casenumber:
+                casenumbers.setdefault(casenumber, []).append(number)
+
+        cases = {}
+        for where in WhereUtil.IN_CHUNKS('CaseNumber', *casenumbers):
+            for case in self.query(where=where, only_open=False, SELECT='CaseNumber'):
+                for number in casenumbers.get(case.CaseNumber, []):
+                    cases[number] = case
+        return cases
+
+    @cached_property
+    def _owner_fieldnames(self):
+        '''Names of our fields that reference an owner.'''
+        return tuple(f.get('name') for f in self.fields
+                     if 'Owner' in f.get('name') and f.get('type') == 'reference')
+
     @cached_property
     def _recordtypeinfos(self):
         return self.describe().get('recordTypeInfos')
@@ -52,16 +92,19 @@ class SFCaseType(SFType, name='Case'):
         This adds parameters to allow restricting query to only open cases,
         as well as only cases with active record type ids. Both default to True.
         '''
+        clauses = []
         if only_open:
-            where = WhereUtil.AND(where, 'IsClosed = FALSE')
+            clauses.append('IsClosed = FALSE')
         if only_active_record_type_ids:
-            where = WhereUtil.AND(where, self._where_recordtypeids)
+            clauses.append(self._where_recordtypeids)
+        if clauses:
+            where = WhereUtil.AND(where, *clauses)
         return super().query(where, **kwargs)
 
 
 class SFCaseObject(SFObject, name='Case'):
     '''SF Case Object.'''
-    @lru_cache
+    @cached_property
     def comments(self):
         '''Get all CaseComments for this Case.
 
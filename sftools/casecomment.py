@@ -16,7 +16,7 @@ class SFCaseCommentType(SFType, name='CaseComment'):
 
         Returns a QueryResult of matching CaseComment objects.
         '''
-        self.query(where=WhereUtil.LIKE('CommentBody', searchstring), **kwargs)
+        return self.query(where=WhereUtil.LIKE('CommentBody', searchstring), **kwargs)
 
 
 class SFCaseCommentObject(SFObject, name='CaseComment'):
@@ -0,0 +1,307 @@
+#!/usr/bin/python3
+#
+# Copyright 2022 Dan Streetman <ddstreet@ieee.org>
+
+from datetime import datetime
+
+from sftools.argparse import SFArgumentParser
+from sftools.argparse import SFObjectArgumentParser
+from sftools.soql import WhereUtil
+
+
+def case_main():
+    parser = SFObjectArgumentParser(default_fields=['CaseNumber'])
+
+    cases_group = parser.add_mutually_exclusive_group()
+    cases_group.add_argument('-n', '--casenumber',
+                             help='Case number (or Case ID)')
+    cases_group.add_argument('-C', '--comment',
+                             help='Case comment contains this text')
+    cases_group.add_argument('-m', '--mycases', action='store_true',
+                             help='Cases owned by me (case owner or escalation owner)')
+    cases_group.add_argument('-o', '--owner',
+                             help='Cases owner by owner (name or ID)')
+
+    opts = parser.parse_args()
+    sf = opts.functions.SF()
+
+    cases = []
+    if opts.casenumber:
+        cases = [sf.Case(opts.casenumber)]
+    elif opts.comment:
+        comments = sf.CaseComment.contains(opts.comment,
+                                           **dict(opts.query_kwargs, SELECT='ParentId'))
+        # Look up all the comments' Cases at once, instead of once per comment
+        cases = [c for c in sf.Case(comments.ParentId) or [] if c]
+    elif opts.mycases:
+        cases = sf.me.cases(**opts.query_kwargs)
+    elif opts.owner:
+        cases = sf.User(opts.owner).cases(**opts.query_kwargs)
+
+    opts.functions.dumpfields(cases)
+
+
+def object_main():
+    parser = SFObjectArgumentParser()
+    parser.description = ('SOQL WHERE syntax: '
+                          'https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/'
+                          'soql_sosl/sforce_api_calls_soql_select_conditionexpression.htm')
+
+    action = parser.action_group
+    action.add_argument('--list-types', action='store_true',
+                        help='List all valid object types')
+
+    parser.add_argument('--from',
+                        help='The SOQL FROM object type, if not specified in WHERE')
+    parser.add_argument('where', nargs='*',
+                        help='The SOQL WHERE clause')
+
+    opts = parser.parse_args()
+    sf = opts.functions.SF()
+
+    where = ' '.join(opts.where)
+    sftype = None
+    if getattr(opts, 'from'):
+        sftype = sf.sftype(getattr(opts, 'from'))
+    elif where:
+        type_field = where.split()[0]
+        if '.' in type_field:
+            sftype = sf.sftype(type_field.split('.')[0])
+
+    if sftype:
+        if opts.list_types:
+            for field in sftype.fieldnames:
+                print(field)
+        elif where:
+            results = sftype.query(where, **opts.query_kwargs)
+            opts.functions.dumpfields(results)
+
+
+def shell_main():
+    parser = SFArgumentParser()
+
+    lazy = parser.add_mutually_exclusive_group()
+    lazy.add_argument('--lazy-fields', action='store_true',
+                      help='Load object fields lazily (default, except in shell mode)')
+    lazy.add_argument('--preload-fields', action='store_true',
+                      help='Preload all object fields (default only in shell mode)')
+
+    action = parser.action_group
+    action.add_argument('-o', '--oauth', action='store_true',
+                        help='Request new OAuth token')
+    action.add_argument('--oauth-refresh', action='store_true',
+                        help='Refresh existing OAuth token')
+    action.add_argument('-e', '--evaluate',
+                        help='Evaluate and print result (e.g. "-e sf.Case(123456).AccountId")')
+
+    opts = parser.parse_args()
+
+    kwargs = {}
+    if opts.lazy_fields:
+        kwargs['preload_fields'] = False
+    elif opts.preload_fields:
+        kwargs['preload_fields'] = True
+
+    sf = opts.functions.SF(**kwargs)
+
+    actions = {
+        'oauth': sf.request_oauth,
+        'oauth_refresh': sf.refresh_oauth,
+        'evaluate': lambda: print(sf.evaluate(opts.evaluate)),
+        # The config was already shown by SF()
+        'show_config': None,
+        'show_full_config': None,
+    }
+    for name, action in actions.items():
+        if getattr(opts, name):
+            if action:
+                action()
+            return
+
+    if 'preload_fields' not in kwargs:
+        sf.preload_fields = True
+    try:
+        import IPython
+    except ImportError:
+        print("Please install ipython (e.g. 'pip install sftools[shell]').")
+        return
+    IPython.start_ipython(argv=[], user_ns={'sf': sf})
+
+
+def timecard_main():
+    import dateparser
+
+    epilog = ('The parameter --after defaults to 1 year ago, to avoid matching too many results, '
+              'and --larger defaults to 1 (minute) to avoid timecards with no logged time.')
+    parser = SFObjectArgumentParser(default_fields=['CaseId__c', 'TotalMinutesStatic__c'],
+                                    epilog=epilog)
+
+    parser.add_argument('-n', '--casenumber', action='append',
+                        help='Case number (or Case ID)')
+    parser.add_argument('-t', '--timecardid', action='append',
+                        help='Timecard id')
+    parser.add_argument('-m', '--mytimecards', action='store_true',
+                        help='Timecards owned by me')
+    parser.add_argument('-o', '--owner',
+                        help='Timecards owned by owner (name or ID)')
+
+    parser.add_argument('-B', '--before',
+                        help='Only timecards with start time <= this date/time')
+    parser.add_argument('-A', '--after',
+                        default='1 year ago',
+                        help='Only timecards with start time >= this date/time '
+                        '(default: 1 year ago)')
+    month = parser.add_mutually_exclusive_group()
+    month.add_argument('--this-month', action='store_true',
+                       help='Only timecards with start time during this calendar month')
+    month.add_argument('--last-month', action='store_true',
+                       help='Only timecards with start time during last calendar month')
+    parser.add_argument('--larger', type=int, default=1,
+                        help='Only timecards with minutes >= this (default: 1)')
+    parser.add_argument('--smaller', type=int, default=0,
+                        help='Only timecards with minutes <= this')
+
+    total = parser.add_mutually_exclusive_group()
+    total.add_argument('-T', '--total', action='store_true',
+                       help='Print total time in hours and minutes')
+    total.add_argument('--total-hours', action='store_true',
+                       help='Print total time, rounding down to hours')
+    total.add_argument('--total-minutes', action='store_true',
+                       help='Print total time in minutes')
+
+    parser.add_argument('--delete', action='store_true',
+                        help='DELETE the timecard(s) - USE WITH CAUTION')
+
+    opts = parser.parse_args()
+    sf = opts.functions.SF()
+    kwargs = opts.query_kwargs
+
+    if opts.this_month or opts.last_month:
+        this_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if this_month.month > 1:
+            last_month = this_month.replace(month=this_month.month - 1)
+        else:
+            last_month = this_month.replace(year=this_month.year - 1, month=12)
+        if this_month.month < 12:
+            next_month = this_month.replace(month=this_month.month + 1)
+        else:
+            next_month = this_month.replace(year=this_month.year + 1, month=1)
+
+        if opts.this_month:
+            kwargs['after'] = this_month
+            kwargs['before'] = next_month
+        elif opts.last_month:
+            if this_month.month > 1:
+                last_month = this_month.replace(month=this_month.month - 1)
+            else:
+                last_month = this_month.replace(year=this_month.year - 1, month=12)
+            kwargs['after'] = last_month
+            kwargs['before'] = this_month
+    else:
+        for o in ['before', 'after']:
+            value = getattr(opts, o)
+            if value:
+                kwargs[o] = dateparser.parse(value)
+                if opts.verbose:
+                    print(f"Parsed '{o}' value '{value}' as '{kwargs[o].isoformat()}'")
+
+    for o in ['larger', 'smaller']:
+        value = getattr(opts, o)
+        if value:
+            kwargs[o] = value
+
+    if opts.verbose:
+        start = kwargs.get('after')
+        end = kwargs.get('before')
+        if start and end:
+            print(f"Date range: '{start}' to '{end}'")
+        elif start:
+            print(f"Date range: after '{start}'")
+        elif end:
+            print(f"Date range: before '{end}'")
+        minsize = kwargs.get('larger')
+        maxsize = kwargs.get('smaller')
+        if minsize and maxsize:
+            print(f'Size range: {minsize} to {maxsize}')
+        elif minsize:
+            print(f'Size range: >= {minsize}')
+        elif maxsize:
+            print(f'Size range: <= {maxsize}')
+
+    timecards = []
+    if opts.casenumber:
+        for n in opts.casenumber:
+            case = sf.Case(n)
+            if case:
+                timecards.extend(case.timecards(**kwargs))
+
+    if opts.timecardid:
+        for i in opts.timecardid:
+            timecard = sf.TimeCard__c(i)
+            if timecard:
+                timecards.append(timecard)
+
+    if opts.mytimecards:
+        timecards.extend(sf.me.timecards(**kwargs))
+
+    if opts.owner:
+        for o in opts.owner:
+            owner = sf.User(o)
+            if owner:
+                timecards.extend(owner.timecards(**kwargs))
+
+    if any((opts.total, opts.total_hours, opts.total_minutes)):
+        total_time = sum([int(tc.TotalMinutesStatic__c) for tc in timecards])
+        hours = total_time // 60
+        minutes = total_time % 60
+        if opts.total:
+            print(f'Total time: {hours} hours {minutes} minutes')
+        elif opts.total_hours:
+            print(f'Total time: {hours} hours')
+        elif opts.total_minutes:
+            print(f'Total time: {total_time} minutes')
+    elif opts.delete:
+        opts.functions.delete(timecards)
+    else:
+        opts.functions.dumpfields(timecards)
+
+
+def user_main():
+    parser = SFObjectArgumentParser(default_fields=['Name', 'Username', 'Alias'])
+
+    parser.add_argument('-m', '--me', action='store_true',
+                        help='Currently authenticated user')
+    parser.add_argument('-e', '--email', action='append',
+                        help='User Email')
+    parser.add_argument('-u', '--userid', action='append',
+                        help='User Id (or Alias)')
+    parser.add_argument('-n', '--name',
+                        help='User name is or contains this value')
+
+    opts = parser.parse_args()
+    sf = opts.functions.SF()
+
+    users = []
+    if opts.me:
+        users.append(sf.me)
+
+    if opts.email:
+        for e in opts.email:
+            matches = sf.User.query(f"Email = '{e}'",
+                                    **opts.query_kwargs)
+            if matches:
+                users.extend(matches)
+
+    if opts.userid:
+        for i in opts.userid:
+            user = sf.User(i)
+            if user:
+                users.append(user)
+
+    if opts.name:
+        matches = sf.User.query(WhereUtil.LIKE('Name', opts.name),
+                                **opts.query_kwargs)
+        if matches:
+            users.extend(matches)
+
+    opts.functions.dumpfields(users)
@@ -3,12 +3,56 @@
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
 import configparser
+import errno
 import os
+import threading
 
+from contextlib import contextmanager
 from functools import cached_property
+from functools import lru_cache
 from io import StringIO
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    from platformdirs import user_cache_dir
+except ImportError:
+    user_cache_dir = None
+
+
+@lru_cache(maxsize=16)
+def _parse_config_file(path, mtime_ns, size):
+    '''Parse the config file, returning a dict of its sections' raw values.
+
+    The file's mtime and size are only used to key the cache, so a changed file
+    is parsed again, while an unchanged file is only parsed once.
+    '''
+    # Use a default section name that can't be in the file, to keep any [DEFAULT] as-is
+    config = configparser.ConfigParser(default_section='\0')
+    try:
+        text = Path(path).read_text()
+    except OSError:
+        return {}
+    config.read_string(text, source=path)
+    return {section: dict(config.items(section, raw=True)) for section in config.sections()}
+
+
+def _read_config_file(path):
+    '''Read the config file, returning a dict of its sections' raw values.
+
+    A missing or unreadable file is treated as empty, like ConfigParser.read() does.
+    '''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    return _parse_config_file(str(path), st.st_mtime_ns, st.st_size)
+
 
 class SFConfig(object):
     '''SF config file.
@@ -22,12 +66,19 @@ class SFConfig(object):
     and their content will be updated automatically. To specify a custom
     config file that should be updated, set the readonly parameter to False.
 
-    This class should NOT be used from multiple processes with the same
-    config file, as there is no attempt to synchronize reads/writes nor
-    will this class notice if another process updates the config file.
+    Reads and writes of the config file are serialized with other processes
+    using an advisory lock file, but this class will not otherwise notice if
+    another process updates the config file; use lock() and reload() to
+    safely perform a read-modify-write of the config file content.
     '''
     DEFAULT_PATH = Path('/etc/sftools')
-    USER_PATH = Path(os.getenv('XDG_CONFIG_HOME', '~/.config')).expanduser().resolve() / 'sftools'
+    USER_PATH = Path(os.getenv('XDG_CONFIG_HOME', '~/.config')).expanduser().absolute() / 'sftools'
+    if user_cache_dir:
+        # Use the platform's cache location, e.g. on macOS ~/Library/Caches
+        CACHE_PATH = Path(user_cache_dir('sftools', appauthor=False)).absolute()
+    else:
+        CACHE_PATH = Path(os.getenv('XDG_CACHE_HOME', '~/.cache')).expanduser().absolute()
+        CACHE_PATH /= 'sftools'
 
     DEFAULT_FILENAME = 'default.conf'
     PRODUCTION_FILENAME = 'production.conf'
@@ -41,7 +92,10 @@ class SFConfig(object):
             config.add_section(configparser.DEFAULTSECT)
         config.add_section('salesforce')
         if read:
-            config.read(read)
+            if isinstance(read, (str, bytes, os.PathLike)):
+                read = [read]
+            for path in read:
+                config.read_dict(_read_config_file(path))
         return config
 
     @classmethod
@@ -52,8 +106,17 @@ class SFConfig(object):
         configfiles = [cls.DEFAULT_PATH / cls.DEFAULT_FILENAME]
         if configfile:
             configfiles.append(cls.USER_PATH / Path(configfile).expanduser())
-        config = cls._configparser(read=configfiles)
-        return config.getboolean('salesforce', 'production', fallback=fallback)
+        # Look up the setting in the (cached) parsed files, without building a ConfigParser
+        defaults = {}
+        settings = {}
+        for path in configfiles:
+            sections = _read_config_file(path)
+            defaults.update(sections.get(configparser.DEFAULTSECT, {}))
+            settings.update(sections.get('salesforce', {}))
+        value = settings.get('production', defaults.get('production'))
+        if value is None:
+            return fallback
+        return cls._boolean(value)
 
     @classmethod
     def DEFAULT(cls):
@@ -73,6 +136,8 @@ class SFConfig(object):
     def __init__(self, configfile, readonly=True, production=None):
         self._configfile = configfile
         self._readonly = readonly
+        self._lock = threading.RLock()
+        self._lockfd = None
         if production is None:
             self._production = self.IS_PRODUCTION(self.path)
         else:
@@ -80,7 +145,8 @@ class SFConfig(object):
 
     @cached_property
     def _user_config(self):
-        return self._configparser(read=self.path, nodefault=True)
+        with self.lock(shared=True):
+            return self._configparser(read=self.path, nodefault=True)
 
     @cached_property
     def _default_config(self):
@@ -90,32 +156,123 @@ class SFConfig(object):
         config = self._configparser(read=configfiles, nodefault=True)
         return config
 
-    @property
+    @cached_property
     def config(self):
         config = self._configparser()
-        config.read_dict(self._default_config)
-        config.read_dict(self._user_config)
+        # Only read their real sections, not their placeholder default section
+        for c in (self._default_config, self._user_config):
+            config.read_dict({section: c[section] for section in c.sections()})
         return config
 
     @cached_property
     def path(self):
         return self.USER_PATH / Path(self._configfile).expanduser()
 
+    @property
+    def lockpath(self):
+        return self.path.with_name(f'{self.path.name}.lock')
+
     @property
     def readonly(self):
         return self._readonly
 
-    def _get(self, func, key, fallback=None, required=False):
-        value = func('salesforce', key, fallback=fallback)
+    @contextmanager
+    def lock(self, shared=False):
+        '''Lock our config file against access from other processes.
+
+        This uses an advisory lock on a separate lock file next to our config
+        file. The lock is exclusive, unless 'shared' is True; shared locks are
+        always exclusive on platforms without flock().
+
+        This may be nested; while any lock is held, inner calls do not change it.
+
+        If we are readonly, no lock is taken (and no lock file is created), since
+        we never write our config file. If the lock file can't be created, e.g. if
+        the directory for our config file does not exist yet or is not writable,
+        no lock is taken either.
+        '''
+        with self._lock:
+            if self._lockfd is not None or self.readonly:
+                yield
+                return
+
+            try:
+                fd = os.open(self.lockpath, os.O_RDWR | os.O_CREAT)
+            except OSError:
+                yield
+                return
+
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                else:
+                    self._msvcrt_lock(fd)
+                self._lockfd = fd
+                yield
+            finally:
+                if self._lockfd is not None and not fcntl:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                self._lockfd = None
+                os.close(fd)
+
+    @staticmethod
+    def _msvcrt_lock(fd):
+        '''Wait until we lock fd.
+
+        Unlike flock(), msvcrt.locking() gives up with EDEADLK after trying
+        for about 10 seconds, so keep trying until we get it.
+        '''
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError as e:
+                if e.errno != errno.EDEADLK:
+                    raise
+
+    def reload(self):
+        '''Discard our in-memory user config, so it is read again from our config file.
+
+        Any changes not yet saved are lost.
+        '''
+        self.__dict__.pop('_user_config', None)
+        self._config_changed()
+
+    def _config_changed(self):
+        '''Discard our merged config, after our user config changed.'''
+        self.__dict__.pop('config', None)
+        self.__dict__.pop('_settings', None)
+
+    @cached_property
+    def _settings(self):
+        '''Our merged config values, as a plain dict.
+
+        Looking up values in this is much cheaper than going through ConfigParser.
+        '''
+        return dict(self.config.items('salesforce'))
+
+    @staticmethod
+    def _boolean(value):
+        try:
+            return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+        except KeyError:
+            raise ValueError(f'Not a boolean: {value}')
+
+    def _get(self, key, fallback=None, required=False, convert=None):
+        value = self._settings.get(key.lower())
+        if value is None:
+            value = fallback
+        elif convert:
+            value = convert(value)
         if value is None and required:
             raise ValueError(f'Missing required config: {key}')
         return value
 
     def get(self, key, fallback=None, required=False):
-        return self._get(self.config.get, key, fallback=fallback, required=required)
+        return self._get(key, fallback=fallback, required=required)
 
     def getboolean(self, key, fallback=None, required=False):
-        return self._get(self.config.getboolean, key, fallback=fallback, required=required)
+        return self._get(key, fallback=fallback, required=required, convert=self._boolean)
 
     def set(self, key, value):
         '''Set the key to value.
@@ -124,10 +281,20 @@ class SFConfig(object):
 
         To save this change to our config file, use the save() method.
         '''
+        self.set_many({key: value})
+
+    def set_many(self, settings):
+        '''Set each key in the settings dict to its value.
+
+        This is the same as calling set() for each key, but only discards our
+        merged config once.
+        '''
         if 'production' not in self._user_config['salesforce']:
             # Store 'production' setting if not yet set
             self._user_config.set('salesforce', 'production', str(self._production))
-        self._user_config.set('salesforce', key, value)
+        for key, value in settings.items():
+            self._user_config.set('salesforce', key, value)
+        self._config_changed()
 
     def save(self):
         '''Save our current config to our config file.
@@ -136,28 +303,29 @@ class SFConfig(object):
         and will instead print out our config and ask the user
         to manually update the config file.
         '''
-        content = self._repr(full=False)
         if self.readonly:
             print('Refusing to save config to file, please update it manually:')
             print('')
-            print(content)
+            print(self._repr(full=False))
         else:
             self.path.parent.mkdir(parents=True, exist_ok=True)
-            self.path.write_text(content)
+            with self.lock(), self.path.open('w') as f:
+                self._write(f, full=False)
 
     def __repr__(self):
         return self._repr(True)
 
     def _repr(self, full):
+        with StringIO() as s:
+            self._write(s, full)
+            return s.getvalue()
+
+    def _write(self, fp, full):
         if full:
-            config = self._configparser(nodefault=True)
-            config.read_dict(self._default_config)
-            config.read_dict(self._user_config)
+            config = self.config
         else:
             config = self._user_config
-        with StringIO() as s:
-            config.write(s)
-            return s.getvalue()
+        config.write(fp)
 
     def show(self, full=False):
         print(self._repr(full=full))
@@ -3,10 +3,11 @@
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
 import dateparser
+import time
 
 from datetime import datetime
 from datetime import timezone
-from functools import partialmethod
+from functools import lru_cache
 
 from sftools.case import SFCaseObject
 from sftools.object import SFObject
@@ -21,16 +22,30 @@ SETTINGS_FORCE_UTC = {
 }
 
 
-def timecards_from(obj, funcname, **kwargs):
-    return getattr(obj._sf.sftype('TimeCard__c'), funcname)(obj, **kwargs)
+@lru_cache(maxsize=256)
+def _parsedatetime(value, minute):
+    '''Parse the datetime string; this is cached, as dateparser is slow.
+
+    Strings may be relative (e.g. '2 hours ago'), so the current minute must
+    be passed in, to only reuse results during the same minute.
+    '''
+    return dateparser.parse(value, settings=SETTINGS_FORCE_UTC)
+
+
+def case_timecards(case, **kwargs):
+    return case._sf.sftype('TimeCard__c').fromcase(case, **kwargs)
+
+
+def user_timecards(user, **kwargs):
+    return user._sf.sftype('TimeCard__c').fromuser(user, **kwargs)
 
 
 # Extend SFCaseObject with timecards()
-SFCaseObject.timecards = partialmethod(timecards_from, 'fromcase')
+SFCaseObject.timecards = case_timecards
 
 
 # Extend SFUserObject with timecards()
-SFUserObject.timecards = partialmethod(timecards_from, 'fromuser')
+SFUserObject.timecards = user_timecards
 
 
 class SFTimeCardType(SFType, name='TimeCard__c'):
@@ -44,22 +59,25 @@ class SFTimeCardType(SFType, name='TimeCard__c'):
     def parsedatetime(self, value):
         if value:
             if not isinstance(value, datetime):
-                value = dateparser.parse(value, settings=SETTINGS_FORCE_UTC)
+                value = _parsedatetime(value, int(time.time() // 60))
             if not value.tzinfo:
                 value = value.replace(tzinfo=timezone.utc)
         return value
 
     def query(self, where, *, before=None, after=None, smaller=None, larger=None, **kwargs):
+        clauses = [where]
         before = self.parsedatetime(before)
         if before:
-            where = WhereUtil.AND(where, f"StartTime__c <= {before.isoformat()}")
+            clauses.append(f"StartTime__c <= {before.isoformat()}")
         after = self.parsedatetime(after)
         if after:
-            where = WhereUtil.AND(where, f"StartTime__c >= {after.isoformat()}")
+            clauses.append(f"StartTime__c >= {after.isoformat()}")
         if larger:
-            where = WhereUtil.AND(where, f"TotalMinutesStatic__c >= {larger}")
+            clauses.append(f"TotalMinutesStatic__c >= {larger}")
         if smaller:
-            where = WhereUtil.AND(where, f"TotalMinutesStatic__c <= {smaller}")
+            clauses.append(f"TotalMinutesStatic__c <= {smaller}")
+        if len(clauses) > 1:
+            where = WhereUtil.AND(*clauses)
         return super().query(where, **kwargs)
 
 
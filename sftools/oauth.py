@@ -2,11 +2,13 @@
 #
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
+import random
 import requests
 import time
 
-from datetime import datetime
-from datetime import timedelta
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode
+from urllib3.util.retry import Retry
 
 
 class OAuthPending(Exception):
@@ -31,9 +33,38 @@ class SFOAuth(object):
     method, which will interactively perform OAuth and update the access and
     refresh tokens.
     '''
+    # Max time, in seconds, to wait for the user to approve access
+    VERIFICATION_TIMEOUT = 5 * 60
+    # Device flow polling interval, in seconds, if the server doesn't provide one
+    DEFAULT_POLL_INTERVAL = 5
+    # Polling interval increase, in seconds, each time the server asks us to slow down
+    SLOW_DOWN_INCREMENT = 5
+    # Max polling interval, in seconds, when the server asks us to slow down
+    MAX_POLL_INTERVAL = 60
+    # Max random delay, in seconds, added to each poll so clients don't poll in lockstep
+    POLL_JITTER = 1
+    # Timeout, in seconds, for each token endpoint request
+    REQUEST_TIMEOUT = 30
+
     def __init__(self, config):
         self.config = config
 
+        # Share one session (and its connection pool) for all our requests,
+        # so each request doesn't need a new connection and TLS handshake
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=16, max_retries=retry))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''Close our session, and its pooled connections.'''
+        self.session.close()
+
     @property
     def access_token(self):
         return self.config.get('access_token')
@@ -80,33 +111,46 @@ class SFOAuth(object):
 
     def _post(self, data):
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        return requests.post(self.token_url, data=data, headers=headers)
+        return self.session.post(self.token_url, data=data, headers=headers,
+                                 timeout=self.REQUEST_TIMEOUT)
 
     def request_access_token(self, show_token=False):
         verification = self._request_verification_code()
         print(f"Please approve access: {verification.url}")
         print('Waiting for verification...', end='', flush=True)
 
-        start = datetime.now()
-        timeout = timedelta(minutes=5)
-        interval = int(verification.interval or 1)
-        code = verification.device_code
-        while datetime.now() - start < timeout:
+        timeout = self.VERIFICATION_TIMEOUT
+        if verification.expires_in:
+            # No point polling after the device code expires
+            timeout = min(timeout, int(verification.expires_in))
+        deadline = time.monotonic() + timeout
+        interval = int(verification.interval or self.DEFAULT_POLL_INTERVAL)
+        # The token request is the same for every poll
+        data = {
+            'grant_type': 'device',
+            'client_id': self.client_id,
+            'code': verification.device_code,
+        }
+        while time.monotonic() < deadline:
             try:
-                token = self._request_access_token(code)
-                self.access_token = token.get('access_token')
-                self.refresh_token = token.get('refresh_token')
+                token = self._request_access_token(data)
+                self.config.set_many({
+                    'access_token': token.get('access_token'),
+                    'refresh_token': token.get('refresh_token'),
+                })
                 print('approved.')
                 print('')
                 if show_token:
                     print(token)
                 return
             except OAuthSlowDown:
-                interval += 1
+                # RFC 8628 section 3.5: increase the interval by 5 seconds
+                interval = min(interval + self.SLOW_DOWN_INCREMENT, self.MAX_POLL_INTERVAL)
             except OAuthPending:
                 pass
 
-            time.sleep(interval)
+            delay = interval + random.uniform(0, self.POLL_JITTER)
+            time.sleep(max(0, min(delay, deadline - time.monotonic())))
             print('.', end='', flush=True)
 
         print('Verification timeout.')
@@ -121,12 +165,8 @@ class SFOAuth(object):
         r.raise_for_status()
         return SFOAuthVerification(r.json())
 
-    def _request_access_token(self, device_code):
-        r = self._post({
-            'grant_type': 'device',
-            'client_id': self.client_id,
-            'code': device_code,
-        })
+    def _request_access_token(self, data):
+        r = self._post(data)
 
         response = r.json()
 
@@ -147,6 +187,8 @@ class SFOAuth(object):
                 msg = f'Invalid grant for this app (internal error): {d}'
             elif e == 'access_denied':
                 msg = f'User denied access: {d}'
+            elif e == 'expired_token':
+                msg = f'Verification code expired, please try again: {d}'
             else:
                 msg = f'Unknown error: {e} ({d})'
             raise OAuthFailed(msg)
@@ -168,7 +210,10 @@ class SFOAuth(object):
         })
 
         r.raise_for_status()
-        self.access_token = r.json().get('access_token')
+        token = r.json().get('access_token')
+        if not token:
+            raise OAuthFailed(f'No access_token in refresh response: {r.text}')
+        self.access_token = token
 
 
 class SFOAuthVerification(object):
@@ -177,5 +222,6 @@ class SFOAuthVerification(object):
         self.interval = response.get('interval')
         self.user_code = response.get('user_code')
         self.device_code = response.get('device_code')
-        params = {'user_code': self.user_code}
-        self.url = requests.Request('GET', self.verification_uri, params=params).prepare().url
+        self.expires_in = response.get('expires_in')
+        sep = '&' if '?' in self.verification_uri else '?'
+        self.url = f"{self.verification_uri}{sep}{urlencode({'user_code': self.user_code})}"
@@ -14,6 +14,11 @@ class SFObject(object):
     '''SF object for object type and object id.'''
     SUBCLASSES = {}
 
+    # There may be many objects; the __dict__ is only created if used, e.g. by a
+    # subclass cached_property, and __weakref__ is needed for SFType._sfobjects
+    __slots__ = ('_sf', '_sftype', '_name', '_record', '_fetched_all',
+                 '__dict__', '__weakref__')
+
     @classmethod
     def getclass(cls, name):
         return cls.SUBCLASSES.get(name, cls)
@@ -31,6 +36,8 @@ class SFObject(object):
         self._sftype = sftype
         self._name = sftype.name
         self._record = record
+        # If we already queried all our fields
+        self._fetched_all = False
 
     @property
     def dry_run(self):
@@ -60,21 +67,41 @@ class SFObject(object):
         return self.record.get('Id')
 
     def __dir__(self):
-        return list(set(self._sftype.fieldnames) | set(super().__dir__()))
+        return list(self._sftype._sfobject_attrnames | set(self.__dict__))
 
     def __getattr__(self, attr):
-        if attr not in self.__dir__():
+        if attr.startswith('_'):
+            raise AttributeError(f'{self._name} has no attribute {attr}')
+
+        # A class attribute (e.g. a cached_property) only gets here if it raised
+        # AttributeError itself; don't hide that behind a query for a field with
+        # the same name, and don't call it again, which would repeat its queries
+        if hasattr(getattr(type(self), attr, None), '__get__'):
             raise AttributeError(f'{self._name} has no attribute {attr}')
 
         # Is the attribute already in our record?
-        if attr in self.record:
-            return self.record.get(attr)
-
-        # Perform the dynamic lookup by querying Salesforce
-        with suppress(SalesforceMalformedRequest):
-            return self._sftype._query(where=f"{self._name}.Id = '{self.Id}'",
-                                       SELECT=attr).record.get(attr, None)
-        return None
+        if attr in self._record:
+            return self._record.get(attr)
+
+        if attr not in self._sftype._sfobject_attrnames:
+            raise AttributeError(f'{self._name} has no attribute {attr}')
+
+        # Perform the dynamic lookup by querying Salesforce; get all our fields
+        # at once, so looking up our other fields doesn't need more queries,
+        # and only do it once, so fields that aren't returned don't re-query
+        if self._fetched_all:
+            return self.record.get(attr, None)
+        where = f"{self._name}.Id = '{self.Id}'"
+        try:
+            record = self._sftype._query(where=where, preload_fields=True).record
+        except SalesforceMalformedRequest:
+            # FIELDS() selection needs api 51.0 or later, so just query this field
+            with suppress(SalesforceMalformedRequest):
+                self.record.update(self._sftype._query(where=where, SELECT=attr).record)
+            return self.record.get(attr, None)
+        self.record.update(record)
+        self._fetched_all = True
+        return self.record.get(attr, None)
 
     def __repr__(self):
         return f'{self._sftype}: {self.Id}'
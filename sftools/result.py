@@ -6,8 +6,7 @@ from abc import ABC
 from abc import abstractmethod
 from collections.abc import Sequence
 from copy import copy
-
-from sftools.object import SFObject
+from functools import cached_property
 
 
 class Result(Sequence, ABC):
@@ -17,13 +16,18 @@ class Result(Sequence, ABC):
         self._sftype = sftype
         self._result = result
 
-    @property
+    @cached_property
     def records(self):
-        return tuple([Record(r) for r in self._records])
+        '''Get our records.
 
-    @property
+        These are the plain record dicts from the result, which should not be
+        modified; use record to get a Record.
+        '''
+        return tuple(self._records)
+
+    @cached_property
     def sfobjects(self):
-        return tuple([self._sftype(r) for r in self.records])
+        return tuple([self._sftype(r) for r in self._records])
 
     @property
     def record(self):
@@ -31,43 +35,82 @@ class Result(Sequence, ABC):
 
         It is always safe to call get() on the return value.
         '''
-        try:
-            return list(self.records)[0]
-        except IndexError:
-            return Record()
+        return Record(self._records[0]) if self._records else Record()
 
     @property
     def sfobject(self):
         '''Get our first SFObject, or None if we have no Records.'''
-        try:
-            return list(self.sfobjects)[0]
-        except IndexError:
-            return None
+        if 'sfobjects' in self.__dict__:
+            return self.sfobjects[0] if self.sfobjects else None
+        # Don't create all our SFObjects just to get the first one
+        return self._sftype(self._records[0]) if self._records else None
 
     @property
     @abstractmethod
     def _records(self):
         pass
 
+    # The key of our records list in our result
+    _records_key = None
+
+    def __add__(self, other):
+        '''Add the records from other to our records.'''
+        result = self.__class__(self._sftype, self._result)
+        result += other
+        return result
+
+    # Whether we own our records list, i.e. if __iadd__() may change it
+    _own_records = False
+
+    def __iadd__(self, other):
+        '''Add the records from other to our records, in place.
+
+        This is the same as __add__(), but extends our existing records list
+        instead of creating a new list with all the records; when adding many
+        batches, like SF.query() does, this avoids copying all the previous
+        records for each added batch.
+
+        Our original records list may be shared (e.g. with the SF query cache,
+        or the Result we were added from), so it is copied the first time, and
+        only extended after that.
+        '''
+        records = self._result.get(self._records_key, [])
+        if not self._own_records:
+            records = list(records)
+            self._own_records = True
+        records.extend(other._result.get(self._records_key, []))
+
+        result = copy(other._result)
+        result[self._records_key] = records
+        self._result = result
+
+        # Our cached records and sfobjects are stale now
+        self.__dict__.pop('records', None)
+        self.__dict__.pop('sfobjects', None)
+        return self
+
     def __getattr__(self, attr):
-        if attr not in self.__dir__():
+        if attr.startswith('_') or attr not in self._sftype._sfobject_attrnames:
             raise AttributeError(f'{self._sftype.name} has no attribute {attr}')
 
-        return list(filter(None, set([getattr(o, attr, None) for o in self.sfobjects])))
+        if attr in self._sftype._fieldnameset:
+            # Get the field for all our objects at once, instead of once per object
+            self._sftype.prefetch(self.sfobjects, attr)
+
+        # Drop duplicate values, but keep them in the order of our objects
+        return list(filter(None, dict.fromkeys(getattr(o, attr, None) for o in self.sfobjects)))
 
     def __dir__(self):
-        return list(filter(None, (set(self._sftype.fieldnames) |
-                                  set(super().__dir__()) |
-                                  set(dir(SFObject.getclass(self._sftype.name))))))
+        return [a for a in self._sftype._sfobject_attrnames.union(super().__dir__()) if a]
 
     def __getitem__(self, key):
-        return list(self.sfobjects)[key]
+        return self.sfobjects[key]
 
     def __iter__(self):
-        yield from self.sfobjects
+        return iter(self.sfobjects)
 
     def __len__(self):
-        return len(self.records)
+        return len(self._records)
 
 
 class Record(dict):
@@ -81,6 +124,9 @@ class Record(dict):
     This overrides getattr so all dictionary keys can be directly accessed
     as attributes.
     '''
+    # There is a Record per result record, don't give each one a __dict__ too
+    __slots__ = ()
+
     @property
     def attributes(self):
         '''Get the RecordAttributes.
@@ -95,6 +141,8 @@ class Record(dict):
 
 
 class RecordAttributes(dict):
+    __slots__ = ()
+
     @property
     def type(self):
         return self.get('type')
@@ -117,6 +165,11 @@ class QueryResult(Result):
     def done(self):
         return self._result.get('done', True)
 
+    @property
+    def nextRecordsUrl(self):
+        '''The url to query the next batch of records, if we are not done.'''
+        return self._result.get('nextRecordsUrl')
+
     @property
     def _records(self):
         return self._result.get('records', [])
@@ -126,13 +179,22 @@ class QueryResult(Result):
         '''Online docs name this field "size", but in actual result field name is "totalSize"'''
         return int(self._result.get('totalSize', 0))
 
-    def __add__(self, other):
-        result = copy(other._result)
-        result['done'] = self.done or other.done
-        result['totalSize'] = self.totalSize + other.totalSize
-        result['records'] = ((self._result.get('records', [])) +
-                             (other._result.get('records', [])))
-        return self.__class__(self._sftype, result)
+    _records_key = 'records'
+
+    def __iadd__(self, other):
+        '''Add the records from other to our records, in place.
+
+        The other QueryResult may be the next batch of our query, in which case
+        the combined result is done, and has a nextRecordsUrl, only if the other
+        QueryResult does.
+
+        While not done, the totalSize is the total size of the query results;
+        once done, it is the number of combined records.
+        '''
+        super().__iadd__(other)
+        if other.done:
+            self._result['totalSize'] = len(self._records)
+        return self
 
 
 class SearchResult(Result):
@@ -152,8 +214,4 @@ class SearchResult(Result):
     def searchRecords(self):
         return self._result.get('searchRecords', [])
 
-    def __add__(self, other):
-        result = copy(other._result)
-        result['searchRecords'] = ((self._result.get('searchRecords', [])) +
-                                   (other._result.get('searchRecords', [])))
-        return self.__class__(self._sftype, result)
+    _records_key = 'searchRecords'
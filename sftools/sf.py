@@ -2,11 +2,17 @@
 #
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
+import importlib
 import re
+import threading
+import time
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 from functools import cached_property
 from functools import lru_cache
+from urllib.parse import urlencode
 
 try:
     from simple_salesforce import Salesforce
@@ -14,13 +20,45 @@ try:
 except ImportError:
     raise RuntimeError('Please install simple-salesforce.')
 
+from sftools.cache import SFCache
 from sftools.result import QueryResult
 from sftools.result import SearchResult
 from sftools.config import SFConfig
 from sftools.oauth import SFOAuth
 from sftools.soql import SOQL
+from sftools.soql import WhereUtil
 from sftools.type import SFType
 
+# Modules with SFType and SFObject subclasses, which are registered on import
+TYPE_MODULES = (
+    'sftools.case',
+    'sftools.casecomment',
+    'sftools.user',
+    # Custom modules, for non-standard type/object deployments
+    'sftools.custom',
+)
+
+
+@lru_cache(maxsize=1)
+def _register_types():
+    '''Import all TYPE_MODULES, so their __init_subclass__() methods are called.
+
+    This is only done once a type is actually needed, so e.g. just showing
+    the config doesn't import them.
+    '''
+    for module in TYPE_MODULES:
+        importlib.import_module(module)
+
+
+@lru_cache(maxsize=256)
+def _compile(e):
+    '''Compile the string expression for SF.evaluate().
+
+    This is cached, so evaluating the same expression repeatedly (e.g. from
+    shell history) only compiles it once.
+    '''
+    return compile(e, '<sf.evaluate>', 'eval')
+
 
 class SF(object):
     '''Interface to Salesforce.
@@ -31,8 +69,18 @@ class SF(object):
     '''
     # https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/soql_sosl/sforce_api_calls_sosl_find.htm#reserved_chars
     SOSL_RESERVED_CHARS = re.compile(r'([?&|!{}[\]()^~*:\\"\'+-])')
+    SOSL_ESCAPE_TABLE = str.maketrans({c: f'\\{c}' for c in '?&|!{}[]()^~*:\\"\'+-'})
 
-    def __init__(self, config=None, verbose=False, preload_fields=False, sf_version=None, dry_run=False):
+    # Max number of query results to keep cached
+    QUERY_CACHE_SIZE = 256
+    # Seconds to keep query results cached; objects may change in Salesforce
+    QUERY_CACHE_TTL = 300
+
+    # Max number of concurrent query requests; Salesforce limits concurrent api requests
+    QUERY_WORKERS = 4
+
+    def __init__(self, config=None, verbose=False, preload_fields=False, sf_version=None,
+                 dry_run=False, cache=True):
         if isinstance(config, str):
             config = SFConfig(config)
         self._config = config or SFConfig.DEFAULT()
@@ -40,11 +88,22 @@ class SF(object):
         self.verbose = verbose
         self.preload_fields = preload_fields
         self.dry_run = dry_run
+        self.use_cache = cache
+        self._refresh_lock = threading.Lock()
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._sftypes = {}
 
     @property
     def config(self):
         return self._config
 
+    @cached_property
+    def cache(self):
+        '''On-disk cache for metadata of our Salesforce instance and API version.'''
+        path = self.config.CACHE_PATH / self._salesforce.sf_instance / self._sf_version
+        return SFCache(path, enabled=self.use_cache)
+
     @cached_property
     def oauth(self):
         return SFOAuth(self.config)
@@ -71,7 +130,16 @@ class SF(object):
 
     @cached_property
     def _salesforce(self):
-        return Salesforce(version=self._sf_version, **self._salesforce_login_params)
+        return Salesforce(version=self._sf_version, session=self.oauth.session,
+                          **self._salesforce_login_params)
+
+    @cached_property
+    def _salesforce_attrnames(self):
+        return frozenset(dir(self._salesforce))
+
+    def _reset_salesforce(self):
+        self.__dict__.pop('_salesforce', None)
+        self.__dict__.pop('_salesforce_attrnames', None)
 
     def request_oauth(self):
         '''Perform OAuth and save the tokens to our config file.
@@ -82,39 +150,45 @@ class SF(object):
         self.oauth.request_access_token(self.verbose)
         self.config.save()
 
-    def refresh_oauth(self):
+    def refresh_oauth(self, expired_token=None):
         '''Refresh our OAuth access_token and save the token to our config file.
 
         This will REPLACE the existing config file content, if any,
         unless we are using an alternate config file.
 
         This should only be used if we have a valid refresh token.
-        '''
-        # Remove the cached property so it will fetch a new Salesforce instance
-        del self._salesforce
-
-        self.oauth.refresh_access_token()
-        self.config.save()
-
-    def _sf_call_and_refresh(self, func, after_refresh=None):
-        '''Perform a SF action, i.e. function call or attribute access.
 
-        This will attempt to refresh an expired access token.
-
-        If the 'after_refresh' param is provided, it should be a callable
-        which will be called after refreshing oauth, and before the retry
-        of 'func'.
+        If 'expired_token' is provided, the refresh is skipped if our access_token
+        has already changed from it, i.e. if another thread or process already
+        refreshed it; refreshing again would needlessly invalidate that new
+        access_token.
+        '''
+        with self._refresh_lock, self.config.lock():
+            if expired_token is not None:
+                if not self.config.readonly:
+                    # Pick up the access_token from any other process' refresh
+                    self.config.reload()
+                if self.oauth.access_token != expired_token:
+                    self._reset_salesforce()
+                    return
+
+            # Remove the cached property so it will fetch a new Salesforce instance
+            self._reset_salesforce()
+            self.clear_query_cache()
+
+            self.oauth.refresh_access_token()
+            self.config.save()
+
+    def _refresh_expired_session(self, expired_token, error):
+        '''Refresh our OAuth access_token after a SalesforceExpiredSession error.
+
+        The 'expired_token' should be the access_token used by the failed call;
+        if we can't refresh (i.e. we have no refresh token), 'error' is raised.
         '''
         try:
-            return func()
-        except SalesforceExpiredSession as e:
-            try:
-                self.refresh_oauth()
-            except ValueError:
-                raise e
-            if after_refresh:
-                after_refresh()
-            return func()
+            self.refresh_oauth(expired_token=expired_token)
+        except ValueError:
+            raise error
 
     def _salesforce_call(self, func, *args, **kwargs):
         '''Perform a SF call, e.g. query() or search().
@@ -128,14 +202,29 @@ class SF(object):
         if self.verbose:
             params = list(args) + [f'{key}={value}' for key, value in kwargs.items()]
             print(f'SF: {func}({", ".join(params)})')
-        return self._sf_call_and_refresh(lambda: getattr(self._salesforce, func)(*args, **kwargs))
+        access_token = self.oauth.access_token
+        try:
+            return getattr(self._salesforce, func)(*args, **kwargs)
+        except SalesforceExpiredSession as e:
+            self._refresh_expired_session(access_token, e)
+            return getattr(self._salesforce, func)(*args, **kwargs)
 
     def _salesforce_attr(self, attr):
-        return self._sf_call_and_refresh(lambda: getattr(self._salesforce, attr))
+        access_token = self.oauth.access_token
+        try:
+            return getattr(self._salesforce, attr)
+        except SalesforceExpiredSession as e:
+            self._refresh_expired_session(access_token, e)
+            return getattr(self._salesforce, attr)
 
-    @lru_cache
     def sftype(self, typename):
-        return SFType.getclass(typename)(self, self._salesforce_attr(typename))
+        sftype = self._sftypes.get(typename)
+        if sftype is None:
+            _register_types()
+            sftype = SFType.getclass(typename)(self, self._salesforce_attr(typename))
+            # Another thread may have created it first, only keep one
+            sftype = self._sftypes.setdefault(typename, sftype)
+        return sftype
 
     @cached_property
     def _salesforce_objectnames(self):
@@ -145,19 +234,25 @@ class SF(object):
         - queryable
         - searchable
         '''
-        valid = filter(lambda o: o.get('queryable') and o.get('searchable'),
-                       self._salesforce_call('describe').get('sobjects'))
-        return tuple(map(lambda o: o.get('name'), valid))
+        def objectnames():
+            valid = filter(lambda o: o.get('queryable') and o.get('searchable'),
+                           self._salesforce_call('describe').get('sobjects'))
+            return list(map(lambda o: o.get('name'), valid))
+        return tuple(self.cache.cached('objectnames', objectnames))
+
+    @cached_property
+    def _salesforce_objectnameset(self):
+        return frozenset(self._salesforce_objectnames)
 
     def __dir__(self):
-        return tuple(set(self._salesforce_objectnames) |
-                     set(dir(self._salesforce)) |
+        return tuple(self._salesforce_objectnameset |
+                     self._salesforce_attrnames |
                      set(super().__dir__()))
 
     def __getattr__(self, attr):
-        if attr in self._salesforce_objectnames:
+        if attr in self._salesforce_objectnameset:
             return self.sftype(attr)
-        if attr in dir(self._salesforce):
+        if attr in self._salesforce_attrnames:
             return getattr(self._salesforce, attr)
         raise AttributeError(f"Salesforce has no object type '{attr}'")
 
@@ -170,7 +265,7 @@ class SF(object):
         '''
         if self.verbose:
             print(f'SF evaluate: {e}')
-        return eval(e, dict(sf=self, **globals()))
+        return eval(_compile(e), dict(sf=self, **globals()))
 
     def soql(self, WHERE, **kwargs):
         if not kwargs.get('SELECT') or not kwargs.get('FROM'):
@@ -180,12 +275,89 @@ class SF(object):
         kwargs.setdefault('preload_fields', self.preload_fields)
         return SOQL(WHERE=WHERE, **kwargs)
 
+    def clear_query_cache(self):
+        '''Clear all cached query results.'''
+        with self._query_cache_lock:
+            self._query_cache.clear()
+
     def _query(self, soql):
         '''Low-level SF query (SOQL)
 
         You should know what you're doing when you call this.
+
+        Complete (i.e. done) query results are cached by their SOQL clause, so
+        repeating the same query within QUERY_CACHE_TTL seconds does not call
+        Salesforce again; use clear_query_cache() to discard cached results.
         '''
-        return QueryResult(self.sftype(soql.FROM), self._salesforce_call('query', soql.clause))
+        clause = soql.clause
+        now = time.monotonic()
+        result = None
+        with self._query_cache_lock:
+            expires, cached = self._query_cache.get(clause, (0, None))
+            if expires > now:
+                result = cached
+                self._query_cache.move_to_end(clause)
+            elif cached is not None:
+                del self._query_cache[clause]
+
+        if result is None:
+            result = self._salesforce_query(soql)
+            # Don't cache incomplete results, as their query cursor will expire
+            if result.get('done', True):
+                with self._query_cache_lock:
+                    self._query_cache[clause] = (now + self.QUERY_CACHE_TTL, result)
+                    if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                        self._query_cache.popitem(last=False)
+
+        return QueryResult(self.sftype(soql.FROM), result)
+
+    def _salesforce_query(self, soql):
+        '''Query Salesforce, also describing the queried type if needed.
+
+        If the type hasn't been described yet, it most likely will be soon, e.g.
+        to look up its fields, so get both with a single composite batch request.
+        If that fails to describe the type, later queries don't try again.
+        '''
+        sftype = self.sftype(soql.FROM)
+        if sftype._described or sftype._describe_failed:
+            return self._salesforce_call('query', soql.clause)
+
+        describe, result = self._composite_batch(f'sobjects/{sftype.name}/describe',
+                                                 f'query?{urlencode(dict(q=soql.clause))}')
+        if describe is not None:
+            sftype._set_describe(describe)
+        else:
+            sftype._describe_failed = True
+        if result is None:
+            # Repeat the query by itself, so it raises the appropriate error
+            result = self._salesforce_call('query', soql.clause)
+        return result
+
+    def _composite_batch(self, *paths):
+        '''Perform multiple GET requests with a single composite batch request.
+
+        REST api:
+        https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/resources_composite_batch.htm
+
+        Each path is relative to the REST api base, e.g. 'sobjects/Case/describe'.
+
+        Returns a list of the results, in the same order as the paths; the
+        result of any failed request is None.
+        '''
+        version = f'v{self._salesforce.sf_version}'
+        batch = [{'method': 'GET', 'url': f'{version}/{path}'} for path in paths]
+        response = self._salesforce_call('restful', 'composite/batch', method='POST',
+                                         json={'batchRequests': batch})
+        return [r.get('result') if r.get('statusCode') == 200 else None
+                for r in response.get('results')]
+
+    def _query_more(self, soql, next_records_url):
+        '''Low-level SF query (SOQL) for the next batch of a not-done QueryResult
+
+        You should know what you're doing when you call this.
+        '''
+        return QueryResult(self.sftype(soql.FROM),
+                           self._salesforce_call('query_more', next_records_url, True))
 
     def query_count(self, soql):
         '''SF query (SOQL) count.
@@ -214,40 +386,114 @@ class SF(object):
 
         Returns a QueryResult object.
         '''
+        soql = self._query_soql(soql_or_where)
+        if soql.preload_fields is True:
+            return self._query_fields_all(soql)
+
+        # Salesforce returns large results in batches; follow its cursor to get them all
+        results = self._query(soql)
+        while not results.done:
+            results += self._query_more(soql, results.nextRecordsUrl)
+        return results
+
+    def query_iter(self, soql_or_where):
+        '''SF query (SOQL), yielding each SFObject.
+
+        This is the same as query(), but only gets each batch of results from
+        Salesforce when the previous batch has been iterated, and doesn't keep
+        previous batches; for large results, this uses much less memory, and
+        callers that stop early don't need to get all the results.
+
+        Queries with FIELDS(ALL) selection still get all the results at once.
+        '''
+        soql = self._query_soql(soql_or_where)
+        if soql.preload_fields is True:
+            yield from self._query_fields_all(soql)
+            return
+
+        results = self._query(soql)
+        yield from results
+        while not results.done:
+            results = self._query_more(soql, results.nextRecordsUrl)
+            yield from results
+
+    def _query_soql(self, soql_or_where):
+        '''Get a SOQL object for query() and query_iter().'''
         if isinstance(soql_or_where, str):
             soql = self.soql(soql_or_where)
         else:
             soql = copy(soql_or_where)
 
-        # Find out how many records we're going to get
-        count = self.query_count(soql)
-
-        # query() has a hard limit of 2000
-        hard_limit = 2000
-
         if soql.preload_fields is None:
             soql.preload_fields = self.preload_fields
-        if soql.preload_fields is True:
-            soql.SELECT = 'FIELDS(ALL)'
-            # FIELDS(ALL) selection has a hard limit of 200
-            hard_limit = 200
+        return soql
 
-        if soql.LIMIT:
-            count = min(soql.LIMIT, count)
-            hard_limit = min(soql.LIMIT, hard_limit)
+    def _query_fields_all(self, soql):
+        '''SF query (SOQL) with FIELDS(ALL) selection.
 
-        # OFFSET has a hard limit of 2000, so max we can get is 2000 + hard_limit
-        if count > 2000 + hard_limit:
-            raise ValueError(f'Query matches too many results ({count})')
+        FIELDS(ALL) selection requires a LIMIT of at most 200, so we can't just
+        follow the query cursor. Instead, if there are more results than fit in
+        the first batch, we follow the query cursor to get all the result Ids,
+        and then get all the fields for those Ids in batches.
+        '''
+        ids_soql = copy(soql)
+
+        # FIELDS(ALL) selection has a hard limit of 200
+        soql.SELECT = 'FIELDS(ALL)'
+        hard_limit = 200
 
+        if soql.LIMIT:
+            hard_limit = min(soql.LIMIT, hard_limit)
+        limit = soql.LIMIT
         soql.LIMIT = hard_limit
 
+        # Most queries fit in the first batch
         results = self._query(soql)
-        while results.totalSize < count:
-            soql.OFFSET = results.totalSize
-            results += self._query(soql)
+        if results.totalSize < hard_limit or results.totalSize == limit:
+            return results
+
+        # Unlike OFFSET, which has a hard limit of 2000, the query cursor can get
+        # all the results, so use it to find the Ids we didn't get yet
+        ids_soql.SELECT = 'Id'
+        ids_soql.preload_fields = False
+        have = {r.get('Id') for r in results._records}
+        ids = [r.get('Id') for r in self.query(ids_soql)._records if r.get('Id') not in have]
+
+        def query_ids(where):
+            page = copy(soql)
+            page.WHERE = where
+            page.OFFSET = None
+            del page.ORDER_BY
+            # Salesforce may still return fewer records than the LIMIT per batch,
+            # so query() this normally, to follow the query cursor if needed
+            page.preload_fields = False
+            return self.query(page)._records
+
+        # Get the batches concurrently, and then put the records back in order
+        records = {}
+        with ThreadPoolExecutor(max_workers=self.QUERY_WORKERS) as executor:
+            for page in executor.map(query_ids, WhereUtil.IN_CHUNKS(f'{soql.FROM}.Id', *ids,
+                                                                    size=hard_limit)):
+                records.update((r.get('Id'), r) for r in page)
+        results += QueryResult(results._sftype, {
+            'done': True,
+            'records': [records[i] for i in ids if i in records],
+        })
         return results
 
+    def gather(self, *funcs):
+        '''Call all the funcs concurrently, and return their results in order.
+
+        Each func is called without any params, for example:
+          sf.gather(lambda: sf.Case(a).AccountId, lambda: sf.Case(b).AccountId)
+
+        Most of the time spent in Salesforce calls is waiting for the response,
+        so performing independent calls concurrently is much faster than one
+        after another. At most QUERY_WORKERS funcs are called at once.
+        '''
+        with ThreadPoolExecutor(max_workers=self.QUERY_WORKERS) as executor:
+            return [f.result() for f in [executor.submit(func) for func in funcs]]
+
     def restful(self, path):
         '''Perform direct rest api call'''
         return self._salesforce_call('restful', path)
@@ -285,4 +531,4 @@ class SF(object):
         SOSL FIND syntax, including reserved characters:
         https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/soql_sosl/sforce_api_calls_sosl_find.htm
         '''
-        return self.SOSL_RESERVED_CHARS.sub(r'\\\1', search)
+        return search.translate(self.SOSL_ESCAPE_TABLE)
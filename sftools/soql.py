@@ -1,3 +1,4 @@
+from functools import cached_property
 
 
 class SOQL(object):
@@ -25,10 +26,13 @@ class SOQL(object):
     def list_from_csv(self, value, default=None):
         if not value:
             return [default] if default else []
-        if not isinstance(value, list):
-            value = [v.strip() for v in value.split(',')]
+        if isinstance(value, str):
+            value = value.split(',')
         # use a dict instead of set to retain ordering, but remove dups
-        return list(dict([(v, None) for v in value if v]).keys())
+        return list(dict.fromkeys(filter(None, (v.strip() for v in value))))
+
+    def _clause_changed(self):
+        self.__dict__.pop('_base_clause', None)
 
     @property
     def SELECT(self) -> list:
@@ -37,9 +41,11 @@ class SOQL(object):
     @SELECT.setter
     def SELECT(self, value: list):
         self._SELECT = self.list_from_csv(value)
+        self._clause_changed()
 
     def SELECT_AND(self, value: list):
-        self.SELECT += self.list_from_csv(value)
+        # Don't extend our list in place, it may be shared with a copy of us
+        self.SELECT = self.SELECT + self.list_from_csv(value)
 
     @property
     def FROM(self) -> str:
@@ -50,6 +56,7 @@ class SOQL(object):
         if value and ',' in value:
             raise ValueError(f'Only support a single object in FROM: {value}')
         self._FROM = value
+        self._clause_changed()
 
     @property
     def WHERE(self) -> str:
@@ -61,6 +68,7 @@ class SOQL(object):
         https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/soql_sosl/sforce_api_calls_soql_select_conditionexpression.htm
         '''
         self._WHERE = value
+        self._clause_changed()
 
     def _WHERE_ARGS(self, *args):
         if self.WHERE not in args:
@@ -82,13 +90,15 @@ class SOQL(object):
     @ORDER_BY.setter
     def ORDER_BY(self, value: list):
         self._ORDER_BY = self.list_from_csv(value, default='Id')
+        self._clause_changed()
 
     @ORDER_BY.deleter
     def ORDER_BY(self):
         self._ORDER_BY = []
+        self._clause_changed()
 
     def ORDER_BY_AND(self, value: list):
-        self.ORDER_BY += self.list_from_csv(value)
+        self.ORDER_BY = self.ORDER_BY + self.list_from_csv(value)
 
     @property
     def LIMIT(self) -> int:
@@ -97,6 +107,7 @@ class SOQL(object):
     @LIMIT.setter
     def LIMIT(self, value: int):
         self._LIMIT = int(value or 0)
+        self._clause_changed()
 
     @property
     def OFFSET(self) -> int:
@@ -106,8 +117,13 @@ class SOQL(object):
     def OFFSET(self, value: int):
         self._OFFSET = int(value or 0)
 
-    @property
-    def clause(self):
+    @cached_property
+    def _base_clause(self):
+        '''Our clause, without OFFSET.
+
+        When paging through results only our OFFSET changes, so this is only
+        rebuilt when any of our other parts change.
+        '''
         if not self.SELECT:
             raise ValueError('SELECT is required')
         if not self.FROM:
@@ -120,35 +136,68 @@ class SOQL(object):
             q = f'{q} ORDER BY {",".join(self.ORDER_BY)}'
         if self.LIMIT:
             q = f'{q} LIMIT {self.LIMIT}'
-        if self.OFFSET:
-            q = f'{q} OFFSET {self.OFFSET}'
         return q
 
+    @property
+    def clause(self):
+        if self.OFFSET:
+            return f'{self._base_clause} OFFSET {self.OFFSET}'
+        return self._base_clause
+
     def __repr__(self):
         return self.clause
 
 
 class WhereUtil(object):
+    # SOQL quoted string escape sequences:
+    # https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/soql_sosl/sforce_api_calls_soql_select_quotedstringescapes.htm
+    ESCAPE_TABLE = str.maketrans({
+        '\\': '\\\\',
+        "'": "\\'",
+        '"': '\\"',
+        '\n': '\\n',
+        '\r': '\\r',
+        '\t': '\\t',
+        '\b': '\\b',
+        '\f': '\\f',
+    })
+
+    @classmethod
+    def ESCAPE(cls, value):
+        '''Escape value for use inside a quoted SOQL string.'''
+        return str(value).translate(cls.ESCAPE_TABLE)
+
     @classmethod
     def IN(cls, name, *args):
         if not name:
             return None
-        inlist = [f"'{a}'" for a in args if a]
+        inlist = [f"'{cls.ESCAPE(a)}'" for a in args if a]
         if not inlist:
             return None
         return f'{name} IN ({",".join(inlist)})'
 
+    @classmethod
+    def IN_CHUNKS(cls, name, *args, size=200):
+        '''Like IN(), but yield a separate IN clause for every 'size' args.
+
+        This keeps each clause small enough for Salesforce's SOQL length limit.
+        '''
+        args = [a for a in args if a]
+        for i in range(0, len(args), size):
+            yield cls.IN(name, *args[i:i + size])
+
     @classmethod
     def LIKE(cls, name, value):
         if not name:
             return None
         if not value:
             return None
-        return f"{name} LIKE '%{value}%'"
+        return f"{name} LIKE '%{cls.ESCAPE(value)}%'"
 
     @classmethod
     def JOIN(cls, action, *args):
-        return f' {action} '.join([f'({a})' for a in args if a])
+        # Drop duplicate clauses, but keep the order so the result is deterministic
+        return f' {action} '.join(dict.fromkeys(f'({a})' for a in args if a))
 
     @classmethod
     def AND(cls, *args):
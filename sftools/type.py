@@ -2,9 +2,11 @@
 #
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
+import re
+
 from contextlib import suppress
 from functools import cached_property
-from functools import partial
+from weakref import WeakValueDictionary
 
 try:
     from simple_salesforce import SalesforceExpiredSession
@@ -15,6 +17,7 @@ except ImportError:
 from sftools.object import SFObject
 from sftools.result import Record
 from sftools.soql import SOQL
+from sftools.soql import WhereUtil
 
 
 class SFType(object):
@@ -24,6 +27,9 @@ class SFType(object):
     '''
     SUBCLASSES = {}
 
+    # Salesforce Ids are 15 (case-sensitive) or 18 (case-insensitive) chars
+    ID_REGEX = re.compile(r'[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?')
+
     @classmethod
     def getclass(cls, name):
         return cls.SUBCLASSES.get(name, cls)
@@ -39,53 +45,130 @@ class SFType(object):
         '''
         self._sf = sf
         self._sftype = sftype
-        self._sfobjects = {}
+        # Only keep our objects while they are in use elsewhere
+        self._sfobjects = WeakValueDictionary()
+        self._describe = None
+        # If describing us in a composite batch request failed
+        self._describe_failed = False
 
         # We have to wrap the simple salesforce SFType._call_salesforce() method
         # so we can catch and handle expired sessions
-        def wrapper(func, *args, **kwargs):
-            p = partial(func, *args, **kwargs)
-            try:
-                return p()
-            except SalesforceExpiredSession as e:
-                try:
-                    self._sf.refresh_oauth()
-                    self._sftype.session_id = self._sf.session_id
-                except ValueError:
-                    raise e
-                return p()
-        self._sftype._call_salesforce = partial(wrapper, self._sftype._call_salesforce)
+        self._sftype_call_salesforce = self._sftype._call_salesforce
+        self._sftype._call_salesforce = self._call_salesforce
+
+    def _call_salesforce(self, *args, **kwargs):
+        '''Call the simple salesforce SFType._call_salesforce(), handling expired sessions.'''
+        session_id = self._sftype.session_id
+        try:
+            return self._sftype_call_salesforce(*args, **kwargs)
+        except SalesforceExpiredSession as e:
+            self._sf._refresh_expired_session(session_id, e)
+            self._update_session()
+            return self._sftype_call_salesforce(*args, **kwargs)
+
+    def _update_session(self):
+        '''Update our simple salesforce SFType after refreshing OAuth.'''
+        if getattr(self._sftype, 'salesforce', None) is not None:
+            # Newer simple salesforce SFTypes get the session_id from their Salesforce instance
+            self._sftype.salesforce = self._sf._salesforce
+        else:
+            self._sftype.session_id = self._sf.session_id
 
     @property
     def dry_run(self):
         return self._sf.dry_run
 
+    def describe(self):
+        '''Describe this SFType.
+
+        This is the simple salesforce SFType.describe(), but cached in memory and on disk.
+        '''
+        if self._describe is None:
+            self._describe = self._sf.cache.cached(self._describe_cachename,
+                                                   self._sftype.describe)
+        return self._describe
+
+    @property
+    def _describe_cachename(self):
+        return f'{self.name}.describe'
+
+    @property
+    def _described(self):
+        '''If our describe() result is available without calling Salesforce.'''
+        if self._describe is None:
+            self._describe = self._sf.cache.get(self._describe_cachename)
+        return self._describe is not None
+
+    def _set_describe(self, describe):
+        '''Set our describe() result, e.g. from a composite batch request.'''
+        self._describe = describe
+        self._sf.cache.set(self._describe_cachename, describe)
+
     @cached_property
     def fields(self):
         return self.describe().get('fields')
 
     @cached_property
     def fieldnames(self):
-        return tuple([f.get('name') for f in self.fields])
+        return tuple(f.get('name') for f in self.fields)
+
+    @cached_property
+    def _fieldnameset(self):
+        '''Our fieldnames, for fast membership checks.'''
+        return frozenset(self.fieldnames)
+
+    @cached_property
+    def _sfobject_attrnames(self):
+        '''All attribute names of our objects, including our fieldnames.'''
+        return self._fieldnameset | frozenset(dir(SFObject.getclass(self.name)))
 
     def __getattr__(self, attr):
         if attr.startswith('_'):
             raise AttributeError(f'{self.name} has no attribute {attr}')
         return getattr(self._sftype, attr)
 
+    def _write(self, method, *args, **kwargs):
+        '''Call the simple salesforce SFType write method.
+
+        Any cached query results might include the changed object, so this
+        also clears the query cache.
+        '''
+        try:
+            return getattr(self._sftype, method)(*args, **kwargs)
+        finally:
+            self._sf.clear_query_cache()
+
+    def create(self, *args, **kwargs):
+        '''See simple salesforce SFType.create().'''
+        return self._write('create', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        '''See simple salesforce SFType.update().'''
+        return self._write('update', *args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        '''See simple salesforce SFType.upsert().'''
+        return self._write('upsert', *args, **kwargs)
+
     def __repr__(self):
         return self._sftype.name
 
     def __dir__(self):
-        return list(set(dir(self._sftype)) | set(super().__dir__()))
+        return list(self._sftype_attrnames | set(super().__dir__()))
+
+    @cached_property
+    def _sftype_attrnames(self):
+        return frozenset(dir(self._sftype))
 
     def _record_to_sfobject(self, record):
         objid = record.get('Id')
-        if objid in self._sfobjects:
-            obj = self._sfobjects.get(objid)
+        # Don't check 'in' first, the object could be removed before we get() it
+        obj = self._sfobjects.get(objid)
+        if obj is not None:
             obj.record.update(record)
         else:
-            obj = SFObject.getclass(self.name)(self, record)
+            # Our object's record is updated later, so it needs its own copy
+            obj = SFObject.getclass(self.name)(self, Record(record))
             self._sfobjects[objid] = obj
         return obj
 
@@ -93,16 +176,39 @@ class SFType(object):
         if not id_or_record:
             return None
 
-        if isinstance(id_or_record, Record):
+        if isinstance(id_or_record, dict):
             return self._record_to_sfobject(id_or_record)
 
-        if id_or_record in self._sfobjects:
-            return self._sfobjects.get(id_or_record)
+        if isinstance(id_or_record, (list, tuple, set, frozenset)):
+            return self._ids_to_sfobjects(id_or_record)
+
+        obj = self._sfobjects.get(id_or_record)
+        if obj is not None:
+            return obj
 
         with suppress(SalesforceMalformedRequest):
             return self._query(where=f"Id = '{id_or_record}'").sfobject
         return None
 
+    def _ids_to_sfobjects(self, object_ids):
+        '''Get the SFObjects for all the object_ids.
+
+        This performs a single query (per batch of object Ids) for all the
+        objects we don't already have, instead of one query per object.
+
+        Returns a list of the SFObjects, in the same order as object_ids;
+        any object that wasn't found is None.
+        '''
+        object_ids = list(object_ids)
+        objs = {i: self._sfobjects.get(i) for i in object_ids if i}
+        missing = [i for i, obj in objs.items() if obj is None]
+        for where in WhereUtil.IN_CHUNKS('Id', *missing):
+            with suppress(SalesforceMalformedRequest):
+                for obj in self._query(where):
+                    # 15 char Ids are the same as the first 15 chars of 18 char Ids
+                    objs[obj.Id] = objs[obj.Id[:15]] = obj
+        return [objs.get(i) if i else None for i in object_ids]
+
     def delete(self, object_id, raw_response=None):
         '''DELETE the object with object_id.
 
@@ -128,11 +234,87 @@ class SFType(object):
         if self.dry_run:
             return True
 
+        # Any cached query results might include this object
+        self._sf.clear_query_cache()
+
         if raw_response is not None:
             return self._sftype.delete(object_id, raw_response=raw_response)
         else:
             return self._sftype.delete(object_id)
 
+    # Max number of objects per composite sobjects request
+    DELETE_BATCH_SIZE = 200
+
+    def delete_many(self, *object_ids):
+        '''DELETE all the objects with object_ids.
+
+        Be careful - this will delete the objects (unless self.dry_run is True).
+
+        This uses the composite sobjects api, which deletes up to 200 objects
+        per request, instead of performing one request per object:
+        https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/resources_composite_sobjects_collections_delete.htm
+
+        Failure to delete one object does not prevent deleting the others.
+
+        If self.dry_run is True, this does not actually perform the delete
+        operations, and returns a successful result for each object.
+
+        Returns a list of the results for each object, which are dicts with
+        'id', 'success', and 'errors' keys.
+        '''
+        object_ids = [i for i in object_ids if i]
+        if self._sf.verbose:
+            print(f'SFtype({self._sftype.name}): delete_many({", ".join(object_ids)})')
+
+        if self.dry_run:
+            return [{'id': i, 'success': True, 'errors': []} for i in object_ids]
+
+        # Any cached query results might include these objects
+        self._sf.clear_query_cache()
+
+        results = []
+        for i in range(0, len(object_ids), self.DELETE_BATCH_SIZE):
+            params = {
+                'ids': ','.join(object_ids[i:i + self.DELETE_BATCH_SIZE]),
+                'allOrNone': 'false',
+            }
+            results += self._sf._salesforce_call('restful', 'composite/sobjects',
+                                                 params=params, method='DELETE')
+        return results
+
+    # Max number of object Ids per prefetch query
+    PREFETCH_BATCH_SIZE = 200
+
+    def prefetch(self, sfobjects, *fields, all_fields=False):
+        '''Query the fields for all of the sfobjects that don't already have them.
+
+        This performs a single query (per batch of object Ids) instead of each
+        object querying each of its missing fields separately.
+
+        If all_fields is True, all fields are queried instead, for all of the
+        sfobjects that haven't already queried all their fields.
+        '''
+        if all_fields:
+            missing = {o.Id: o for o in sfobjects if o.Id and not o._fetched_all}
+            kwargs = {'preload_fields': True}
+        elif fields:
+            missing = {o.Id: o for o in sfobjects
+                       if o.Id and not all(f in o.record for f in fields)}
+            kwargs = {'SELECT': list(fields)}
+        else:
+            return
+
+        ids = list(missing)
+        for i in range(0, len(ids), self.PREFETCH_BATCH_SIZE):
+            batch = ids[i:i + self.PREFETCH_BATCH_SIZE]
+            # The LIMIT tells the query this batch can't have more results
+            where = WhereUtil.IN(f'{self.name}.Id', *batch)
+            for record in self._query(where, LIMIT=len(batch), **kwargs).records:
+                missing[record.get('Id')].record.update(record)
+        if all_fields:
+            for o in missing.values():
+                o._fetched_all = True
+
     def _query(self, where, **kwargs):
         # Internal query call - this avoids subclass extra field defaults, e.g. Case.IsClosed = False
         soql = SOQL(FROM=self.name, WHERE=where, **kwargs)
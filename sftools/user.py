@@ -2,20 +2,23 @@
 #
 # Copyright 2022 Dan Streetman <ddstreet@ieee.org>
 
-from contextlib import suppress
-
-try:
-    from simple_salesforce import SalesforceMalformedRequest
-except ImportError:
-    raise RuntimeError('Please install simple-salesforce.')
-
 from sftools.object import SFObject
 from sftools.soql import SOQL
+from sftools.soql import WhereUtil
 from sftools.type import SFType
 
 
 class SFUserType(SFType, name='User'):
     '''SF User Type.'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # User aliases don't normally change, so remember the ones we looked up
+        self._alias_userids = {}
+
+    def clear_alias_cache(self):
+        '''Forget all the User aliases we looked up.'''
+        self._alias_userids.clear()
+
     def __call__(self, id_or_alias):
         '''Allow looking up users by User.Id or User.Alias'''
         userid = self._useralias_to_userid(id_or_alias)
@@ -26,27 +29,34 @@ class SFUserType(SFType, name='User'):
 
         On failure, 'alias' is returned.
         '''
-        if isinstance(alias, str):
-            with suppress(SalesforceMalformedRequest):
-                return self._query(f"Alias = '{alias}'").record.get('Id', alias)
+        if isinstance(alias, str) and not self.ID_REGEX.fullmatch(alias):
+            userid = self._alias_userids.get(alias)
+            if userid:
+                return userid
+            userid = self._query(f"Alias = '{WhereUtil.ESCAPE(alias)}'").record.get('Id')
+            if userid:
+                self._alias_userids[alias] = userid
+                return userid
         return alias
 
 
 class SFUserObject(SFObject, name='User'):
     '''SF User Object.'''
     def cases(self, only_open=True, LIMIT=None, **kwargs):
-        limit = int(LIMIT or 0)
-        cases = []
-        for f in self._sf.Case.fields:
-            name = f.get('name')
-            if 'Owner' in name and f.get('type') == 'reference':
-                soql = SOQL(FROM='Case', WHERE=f"{name} = '{self.Id}'", LIMIT=limit, **kwargs)
-                soql.SELECT_AND('Id')
-                if only_open:
-                    soql.WHERE_AND('IsClosed = False')
-                cases.extend(self._sf.query(soql))
-            if limit and len(cases) >= limit:
-                break
-        if limit:
-            cases = cases[:limit]
-        return cases
+        '''Get the Cases with any owner field set to us.
+
+        This checks all the owner fields in a single query.
+        '''
+        return list(self.iter_cases(only_open=only_open, LIMIT=LIMIT, **kwargs))
+
+    def iter_cases(self, only_open=True, LIMIT=None, **kwargs):
+        '''Like cases(), but yield each Case, using SF.query_iter().'''
+        userid = self.Id
+        owners = [f"{name} = '{userid}'" for name in self._sf.Case._owner_fieldnames]
+        if not owners:
+            return
+        soql = SOQL(FROM='Case', WHERE=WhereUtil.OR(*owners), LIMIT=LIMIT, **kwargs)
+        soql.SELECT_AND('Id')
+        if only_open:
+            soql.WHERE_AND('IsClosed = False')
+        yield from self._sf.query_iter(soql)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+#
+# Copyright 2022 Dan Streetman <ddstreet@ieee.org>
+
+import re
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from sftools.config import SFConfig
+from sftools.sf import SF
+from sftools.soql import SOQL
+
+
+class FakeSFType(object):
+    '''Minimal simple salesforce SFType.'''
+    def __init__(self, name):
+        self.name = name
+        self.session_id = 'session'
+
+    def _call_salesforce(self, *args, **kwargs):
+        raise AssertionError('unexpected SFType call')
+
+    def describe(self):
+        return {'fields': [{'name': 'Id', 'type': 'id'},
+                           {'name': 'Subject', 'type': 'string'}]}
+
+
+class FakeSalesforce(object):
+    '''Minimal simple salesforce Salesforce, with Case objects.
+
+    Each query result batch has at most 'batch' records, or 'fields_batch'
+    records for FIELDS(ALL) queries. If 'reverse_in' is True, the records
+    for 'Id IN (...)' queries are returned in reverse order.
+    '''
+    sf_version = '59.0'
+    sf_instance = 'test.salesforce.com'
+    session_id = 'session'
+
+    def __init__(self, count, batch=2000, fields_batch=200, reverse_in=False):
+        self.records = [{'Id': f'500{n:015d}', 'Subject': f'subject {n}'}
+                        for n in range(1, count + 1)]
+        self.batch = batch
+        self.fields_batch = fields_batch
+        self.reverse_in = reverse_in
+        self.calls = []
+        self.cursors = {}
+        self.Case = FakeSFType('Case')
+
+    def query(self, clause):
+        self.calls.append(clause)
+        m = re.fullmatch(r'SELECT (\S+) FROM Case(?: WHERE (.*?))?'
+                         r'(?: ORDER BY \S+)?(?: LIMIT (\d+))?', clause)
+        select, where, limit = m.groups()
+
+        records = self.records
+        if where and ' IN (' in where:
+            ids = re.findall(r"'(\w+)'", where)
+            records = [r for r in records if r['Id'] in ids]
+            if self.reverse_in:
+                records = records[::-1]
+        if limit:
+            records = records[:int(limit)]
+
+        if select == 'FIELDS(ALL)':
+            return self._result(records, self.fields_batch)
+        fields = select.split(',')
+        return self._result([{f: r[f] for f in fields} for r in records], self.batch)
+
+    def query_more(self, url, identifier_is_url=False):
+        self.calls.append(url)
+        return self._result(*self.cursors.pop(url))
+
+    def _result(self, records, batch):
+        result = {
+            'totalSize': len(records),
+            'done': len(records) <= batch,
+            'records': [dict(r, attributes={'type': 'Case'}) for r in records[:batch]],
+        }
+        if not result['done']:
+            url = f'/services/data/v59.0/query/cursor-{len(self.calls)}'
+            self.cursors[url] = (records[batch:], batch)
+            result['nextRecordsUrl'] = url
+        return result
+
+
+class FieldsAllQueryTest(unittest.TestCase):
+    '''Test SF.query() with FIELDS(ALL) selection.'''
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.config = SFConfig(str(Path(tmpdir.name) / 'test.conf'), production=True)
+
+    def query(self, fake, LIMIT=None):
+        sf = SF(self.config, cache=False)
+        sf.__dict__['_salesforce'] = fake
+        sf.sftype('Case')._set_describe(fake.Case.describe())
+        soql = SOQL(SELECT='Id', FROM='Case', WHERE="Subject LIKE '%subject%'",
+                    LIMIT=LIMIT, preload_fields=True)
+        return sf.query(soql)
+
+    def assertRecords(self, result, count):
+        self.assertEqual([r.get('Id') for r in result.records],
+                         [f'500{n:015d}' for n in range(1, count + 1)])
+        self.assertTrue(all(r.get('Subject') for r in result.records))
+        self.assertEqual(result.totalSize, count)
+        self.assertTrue(result.done)
+
+    def test_single_batch(self):
+        fake = FakeSalesforce(5)
+        self.assertRecords(self.query(fake), 5)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_over_200(self):
+        fake = FakeSalesforce(450)
+        self.assertRecords(self.query(fake), 450)
+        # first batch, the remaining Ids, then 2 batches of those Ids
+        self.assertEqual(len(fake.calls), 4)
+
+    def test_over_offset_limit(self):
+        self.assertRecords(self.query(FakeSalesforce(3000, batch=2000)), 3000)
+
+    def test_limit_not_multiple_of_200(self):
+        self.assertRecords(self.query(FakeSalesforce(450), LIMIT=300), 300)
+
+    def test_limit_reached_in_first_batch(self):
+        fake = FakeSalesforce(450)
+        self.assertRecords(self.query(fake, LIMIT=200), 200)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_reordered_batches(self):
+        self.assertRecords(self.query(FakeSalesforce(450, reverse_in=True)), 450)
+
+    def test_short_batches(self):
+        self.assertRecords(self.query(FakeSalesforce(450, batch=100, fields_batch=50)), 450)